@@ -27,14 +27,16 @@ This module exposes engine from SQLAlchemy.
 """
 
 # standard library imports
-from configparser import ConfigParser, NoSectionError
+from configparser import ConfigParser, NoOptionError, NoSectionError
 
 import logging as log
 import os
+import time
 
 # related third-package library imports
 import sqlalchemy
 from sqlalchemy.engine.url import URL, make_url
+from sqlalchemy.exc import OperationalError
 
 
 ####################################################################################
@@ -46,7 +48,8 @@ def getEngineFromFile(fileName,
                       host=None,
                       port=None,
                       database=None,
-                      query=None):
+                      query=None,
+                      **engineKVArgs):
     """
     Initializes and returns SQLAlchemy engine using values provided through the
     file. The file must contain "database" section with key "url" defined.
@@ -59,6 +62,9 @@ def getEngineFromFile(fileName,
     one can use drivername, username, password, host, port from the file,
     and pass database name.
 
+    Additional keyword arguments are passed to SQLAlchemy create_engine() and
+    take precedence over values from the file.
+
     Note, if mysql sees "localhost" it switches to using socket, even if port is
     specified. Commonly used way around it is to specify "127.0.0.1" as port for
     local access.
@@ -71,19 +77,21 @@ def getEngineFromFile(fileName,
     pool_size = 5
 
     Raises IOError if the file does not exists.
-    Raises ConfigParser exceptions (such as NoSectionError)
+    Raises ConfigParser exceptions (such as NoSectionError, or NoOptionError
+    if "url" is missing).
     """
     fileName = os.path.expanduser(fileName)
     parser = ConfigParser()
     with open(fileName) as config:
-        # readfp is deprecated in Python3.x, read_file is not in Python2
-        read_file = getattr(parser, "read_file", None) or getattr(parser, "readfp")
-        read_file(config, fileName)
+        parser.read_file(config, fileName)
     try:
         options = dict(parser.items("database"))
     except NoSectionError:
         log.error("File %s does not contain section 'database'", fileName)
         raise
+    if "url" not in options:
+        log.error("File %s does not define 'url' in section 'database'", fileName)
+        raise NoOptionError("url", "database")
 
     if drivername or username or password or host or port or database or query:
         url = make_url(options['url'])
@@ -103,7 +111,7 @@ def getEngineFromFile(fileName,
             url.query = query
         options['url'] = url
 
-    return sqlalchemy.engine_from_config(options, "")
+    return sqlalchemy.engine_from_config(options, "", **engineKVArgs)
 
 ####################################################################################
 
@@ -133,3 +141,37 @@ def getEngineFromArgs(drivername="mysql+mysqldb",
               database=database,
               query=query)
     return sqlalchemy.create_engine(url, **engineKVArgs)
+
+####################################################################################
+
+
+# MySQL client errors worth retrying: server not reachable, or connection lost
+# during the handshake (see include/mysql/errmsg.h)
+_MYSQL_RETRY_ERRORS = (2002, 2003, 2013)
+
+
+def connectWithRetry(engine, maxRetryCount=5, sleepLen=1):
+    """
+    Connects to the server using provided engine and returns the connection.
+
+    If the connection fails it is retried up to maxRetryCount times, with
+    exponential backoff: it sleeps sleepLen seconds before the first retry, and
+    doubles the sleep time for each following one. For MySQL, only failures
+    to reach the server are retried, others such as access denied or unknown
+    database are raised immediately.
+
+    Raises sqlalchemy OperationalError if the last attempt fails.
+    """
+    for attempt in range(maxRetryCount + 1):
+        try:
+            return engine.connect()
+        except OperationalError as e:
+            if attempt == maxRetryCount:
+                raise
+            if engine.url.get_backend_name() == "mysql" and \
+                    e.orig.args[0] not in _MYSQL_RETRY_ERRORS:
+                raise
+            delay = sleepLen * 2 ** attempt
+            log.warning("Failed to connect to %s (attempt %d), retrying in %s sec",
+                        engine.url.host, attempt + 1, delay)
+            time.sleep(delay)
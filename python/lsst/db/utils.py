@@ -26,6 +26,7 @@ in particular these that are specific to different drivers.
 """
 
 # standard library
+import io
 import logging as log
 import os
 import subprocess
@@ -91,14 +92,14 @@ def createDb(conn, dbName, mayExist=False):
     # consider using create_database from helpers:
     # http://sqlalchemy-utils.readthedocs.org/en/latest/database_helpers.html
     if conn.engine.url.get_backend_name() == "mysql":
+        # let the server check existence, saves a round-trip
+        ifNotExists = "IF NOT EXISTS " if mayExist else ""
         try:
-            conn.execute("CREATE DATABASE `%s`" % dbName)
+            conn.execute("CREATE DATABASE %s`%s`" % (ifNotExists, dbName))
         except ProgrammingError as e:
             if e.orig.args[0] == MySqlErr.ER_DB_CREATE_EXISTS:
-                if not mayExist:
-                    raise DatabaseExistsError("CREATE DATABASE", dbName, e.orig)
-            else:
-                raise
+                raise DatabaseExistsError("CREATE DATABASE", dbName, e.orig)
+            raise
     else:
         raise NoSuchModuleError(conn.engine.url.get_backend_name())
 
@@ -124,6 +125,39 @@ def useDb(conn, dbName):
         raise NoSuchModuleError(conn.engine.url.get_backend_name())
 
 
+def createAndUseDb(conn, dbName, mayExist=False):
+    """
+    Create database <dbName> and make it default, in a single round-trip.
+
+    @param conn        Database connection or engine.
+    @param dbName      Database name.
+    @param mayExist    Flag indicating what to do if the database exists.
+
+    Raises InvalidDatabaseNameError if database name is invalid.
+    Raises DatabaseExistsError if the database already exists and mayExist is False.
+    Raises sqlalchemy exceptions.
+
+    Equivalent to createDb() followed by useDb(). The connection must be a
+    single connection (not an engine) for the default database to stick.
+    """
+    if dbName is None:
+        raise InvalidDatabaseNameError("CREATE DATABASE",
+                                       "None passed as database name", None)
+
+    if conn.engine.url.get_backend_name() == "mysql":
+        # MySQLdb enables multi-statements by default, so both statements
+        # go to the server in one packet
+        ifNotExists = "IF NOT EXISTS " if mayExist else ""
+        try:
+            conn.execute("CREATE DATABASE %s`%s`; USE `%s`" % (ifNotExists, dbName, dbName))
+        except ProgrammingError as e:
+            if e.orig.args[0] == MySqlErr.ER_DB_CREATE_EXISTS:
+                raise DatabaseExistsError("CREATE DATABASE", dbName, e.orig)
+            raise
+    else:
+        raise NoSuchModuleError(conn.engine.url.get_backend_name())
+
+
 def dbExists(conn, dbName):
     """
     Return True if database <dbName> exists, False otherwise.
@@ -133,6 +167,11 @@ def dbExists(conn, dbName):
 
     Raises sqlalchemy exceptions.
     """
+    if conn.engine.url.get_backend_name() == "mysql":
+        # single-row lookup, avoids fetching the full list of schemas;
+        # BINARY keeps the match case-sensitive like the name list was
+        return conn.execute("SELECT COUNT(*) FROM information_schema.SCHEMATA "
+                            "WHERE BINARY SCHEMA_NAME = %s", (dbName,)).scalar() > 0
     return dbName in inspect(conn).get_schema_names()
 
 
@@ -150,13 +189,13 @@ def dropDb(conn, dbName, mustExist=True):
 
     Disconnect from the database if it is the current database.
     """
-    if not mustExist and not dbExists(conn, dbName):
-        return
     # consider using create_database from helpers:
     # http://sqlalchemy-utils.readthedocs.org/en/latest/database_helpers.html
     if conn.engine.url.get_backend_name() == "mysql":
+        # let the server check existence, saves a round-trip
+        ifExists = "" if mustExist else "IF EXISTS "
         try:
-            conn.execute("DROP DATABASE `%s`" % dbName)
+            conn.execute("DROP DATABASE %s`%s`" % (ifExists, dbName))
         except DBAPIError as e:
             if e.orig.args[0] == MySqlErr.ER_DB_DROP_EXISTS:
                 raise NoSuchDatabaseError("DROP DATABASE", dbName, e.orig)
@@ -190,6 +229,16 @@ def tableExists(conn, tableName, dbName=None):
 
     Raises sqlalchemy exceptions.
     """
+    if conn.engine.url.get_backend_name() == "mysql":
+        if not dbName:
+            dbName = conn.engine.url.database
+            if not dbName:
+                return False
+        # single lookup on this connection, also covers non-existent database;
+        # BINARY keeps the match case-sensitive, as in dbExists
+        return conn.execute("SELECT COUNT(*) FROM information_schema.TABLES "
+                            "WHERE BINARY TABLE_SCHEMA = %s AND BINARY TABLE_NAME = %s",
+                            (dbName, tableName)).scalar() > 0
 
     # sqlalchemy will throw exception if we call has_table("nonExistentDb", "t")
     # and we are not connected to any database. The code below fixes that bug
@@ -222,15 +271,14 @@ def createTable(conn, tableName, tableSchema, dbName=None, mayExist=False):
     """
     if conn.engine.url.get_backend_name() == "mysql":
         dbNameStr = "`%s`." % dbName if dbName is not None else ""
-        cmd = "CREATE TABLE %s`%s` %s" % (dbNameStr, tableName, tableSchema)
+        ifNotExists = "IF NOT EXISTS " if mayExist else ""
+        cmd = "CREATE TABLE %s%s`%s` %s" % (ifNotExists, dbNameStr, tableName, tableSchema)
         try:
             conn.execute(cmd)
         except DBAPIError as e:
             if e.orig.args[0] == MySqlErr.ER_NO_DB_ERROR:
                 raise InvalidDatabaseNameError(cmd, dbNameStr, e.orig)
             elif e.orig.args[0] == MySqlErr.ER_TABLE_EXISTS_ERROR:
-                if mayExist:
-                    return
                 raise TableExistsError(cmd, dbNameStr + tableName, e.orig)
             else:
                 raise
@@ -309,13 +357,12 @@ def dropTable(conn, tableName, dbName=None, mustExist=True):
     """
     if conn.engine.url.get_backend_name() == "mysql":
         dbNameStr = "`%s`." % dbName if dbName is not None else ""
+        ifExists = "" if mustExist else "IF EXISTS "
         try:
-            conn.execute("DROP TABLE %s`%s`" % (dbNameStr, tableName))
+            conn.execute("DROP TABLE %s%s`%s`" % (ifExists, dbNameStr, tableName))
         except DBAPIError as e:
             if e.orig.args[0] == MySqlErr.ER_BAD_TABLE_ERROR:
-                if mustExist:
-                    raise NoSuchTableError(dbNameStr + tableName)
-                return
+                raise NoSuchTableError(dbNameStr + tableName)
             raise
     else:
         raise NoSuchModuleError(conn.engine.url.get_backend_name())
@@ -335,8 +382,8 @@ def listTables(conn, dbName=None):
     # to the database
     if conn.engine.url.get_backend_name() == "mysql":
         cmd = "SELECT TABLE_NAME FROM information_schema.TABLES "
-        cmd += "WHERE TABLE_SCHEMA='%s'" % dbName
-        rows = conn.execute(cmd)
+        cmd += "WHERE TABLE_SCHEMA=%s"
+        rows = conn.execute(cmd, (dbName,))
         return [x[0] for x in rows]
     else:
         raise NoSuchModuleError(conn.engine.url.get_backend_name())
@@ -356,9 +403,12 @@ def isView(conn, tableName, dbName=None):
     Raises sqlalchemy exceptions.
     """
     if conn.engine.url.get_backend_name() == "mysql":
-        dbNameStr = "'%s'" % dbName if dbName is not None else "DATABASE()"
-        rows = conn.execute("SELECT table_type FROM information_schema.tables "
-                            "WHERE table_schema=%s AND table_name='%s'" % (dbNameStr, tableName))
+        if dbName is not None:
+            rows = conn.execute("SELECT table_type FROM information_schema.tables "
+                                "WHERE table_schema=%s AND table_name=%s", (dbName, tableName))
+        else:
+            rows = conn.execute("SELECT table_type FROM information_schema.tables "
+                                "WHERE table_schema=DATABASE() AND table_name=%s", (tableName,))
         row = rows.first()
         if not row:
             return False
@@ -376,7 +426,7 @@ def userExists(conn, userName, hostName):
     """
     if conn.engine.url.get_backend_name() == "mysql":
         return conn.execute(
-            "SELECT COUNT(*) FROM mysql.user WHERE user='%s' AND host='%s'" %
+            "SELECT COUNT(*) FROM mysql.user WHERE user=%s AND host=%s",
             (userName, hostName)).scalar() == 1
     else:
         raise NoSuchModuleError(conn.engine.url.get_backend_name())
@@ -391,6 +441,8 @@ def loadSqlScript(conn, script, dbName=None):
 
     @param conn        Database connection or engine.
     @param script      File object (object with read() method) or file name.
+                       In-memory file objects (e.g. io.StringIO) are accepted,
+                       their contents is piped to mysql.
     @param dbName      Optional name of the database, if specified then overrides
                        database used by connection/engine.
     """
@@ -405,6 +457,15 @@ def loadSqlScript(conn, script, dbName=None):
             script = open(script)
             cleanup = script.close
 
+        # objects without OS-level file descriptor can't be passed as stdin
+        data = None
+        try:
+            script.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            data = script.read()
+            if not isinstance(data, bytes):
+                data = data.encode()
+
         # write credentials and options to a temporary file, we have to
         # close it but will delete it after mysql finishes.
         cfg = tempfile.NamedTemporaryFile("w", delete=False)
@@ -437,7 +498,10 @@ def loadSqlScript(conn, script, dbName=None):
         try:
             # it will throw on errors
             cmd = ['mysql', '--defaults-file=' + fname]
-            subprocess.check_call(cmd, stdin=script)
+            if data is None:
+                subprocess.check_call(cmd, stdin=script)
+            else:
+                subprocess.run(cmd, input=data, check=True)
         finally:
             # cleanup - remove file with credentials
             os.unlink(fname)
@@ -448,6 +512,53 @@ def loadSqlScript(conn, script, dbName=None):
         raise NoSuchModuleError(url.get_backend_name())
 
 
+def execScript(conn, statements):
+    """
+    Execute a sequence of SQL statements in a single round-trip.
+
+    @param conn        Database connection or engine.
+    @param statements  Sequence of SQL statements (without terminating ";").
+
+    Results of all statements are discarded. Execution stops at the first
+    failing statement, and its error is raised. Unless a transaction was
+    started on the connection, changes are committed.
+
+    If the server connection is lost, the connection is invalidated and the
+    raised exception has connection_invalidated set.
+
+    Raises sqlalchemy exceptions.
+    """
+    if conn.engine.url.get_backend_name() == "mysql":
+        if conn is conn.engine:
+            with conn.connect() as c:
+                return execScript(c, statements)
+
+        script = ";\n".join(statements)
+        dbapi = conn.dialect.dbapi
+        # use DBAPI cursor directly, errors in statements after the first
+        # one are only reported when their results are fetched
+        cursor = conn.connection.cursor()
+        try:
+            try:
+                cursor.execute(script)
+                while cursor.nextset():
+                    pass
+            finally:
+                cursor.close()
+        except dbapi.Error as e:
+            # like SQLAlchemy's own execute, keep a broken DBAPI connection
+            # from going back to the pool
+            invalidated = conn.dialect.is_disconnect(e, conn.connection, cursor)
+            if invalidated:
+                conn.invalidate()
+            raise DBAPIError.instance(script, None, e, dbapi.Error,
+                                      connection_invalidated=invalidated)
+        if not conn.in_transaction():
+            conn.connection.commit()
+    else:
+        raise NoSuchModuleError(conn.engine.url.get_backend_name())
+
+
 #### Unclassified functions ########################################################
 def typeCode2Name(conn, code):
     """
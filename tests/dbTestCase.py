@@ -0,0 +1,129 @@
+# LSST Data Management System
+# Copyright 2013-2015 LSST Corporation.
+#
+# This product includes software developed by the
+# LSST Project (http://www.lsst.org/).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the LSST License Statement and
+# the GNU General Public License along with this program.  If not,
+# see <http://www.lsstcorp.org/LegalNotices/>.
+
+"""
+Common setup for the unittests that need a database server.
+
+@author  Jacek Becla, SLAC
+"""
+
+# standard library
+import logging as log
+import os
+import unittest
+
+# third party
+import sqlalchemy
+
+# local
+from lsst.db.engineFactory import connectWithRetry, getEngineFromFile
+
+
+class DbTestCase(unittest.TestCase):
+    """
+    Base class for tests using the server described by credential file
+    CREDFILE, which subclasses must set. The class is skipped if the file does
+    not exist.
+
+    Set up once per class:
+     - _engine: engine built from the file, shared by all tests; tests return
+       their connections to its pool (with-blocks), so they stay open across
+       tests and each test does not pay for a new handshake
+     - _dbA, _dbB, _dbC: names of scratch databases, dropped before each test
+     - _adminConn: connection used for that cleanup
+    """
+    CREDFILE = None
+    CONNECT_TIMEOUT = 2  # seconds
+    # pooled connections idle longer than this are replaced on checkout rather
+    # than failing on a socket the server already closed (wait_timeout)
+    POOL_RECYCLE = 3600  # seconds
+
+    @classmethod
+    def setUpClass(cls):
+        log.basicConfig(
+            format='%(asctime)s %(name)s %(levelname)s: %(message)s',
+            datefmt='%m/%d/%Y %I:%M:%S',
+            level=os.environ.get("LSST_DB_TEST_LOG_LEVEL", "WARNING").upper())
+
+        cls._credFile = os.path.expanduser(cls.CREDFILE)
+        if not os.path.isfile(cls._credFile):
+            raise unittest.SkipTest("Required file with credentials"
+                                    " '{}' not found.".format(cls._credFile))
+
+        cls._engine = getEngineFromFile(cls._credFile, pool_recycle=cls.POOL_RECYCLE)
+        # parallel runners (e.g. pytest-xdist) need distinct databases per worker
+        worker = os.environ.get("PYTEST_XDIST_WORKER")
+        prefix = "%s_dbWrapperTestDb" % cls._engine.url.username
+        suffix = "_" + worker if worker else ""
+        cls._dbA = "%s_A%s" % (prefix, suffix)
+        cls._dbB = "%s_B%s" % (prefix, suffix)
+        cls._dbC = "%s_C%s" % (prefix, suffix)
+
+        # engines with overridden values, see _pooledEngine
+        cls._engines = {}
+
+        # busy servers sporadically refuse the first connection, retry here
+        # instead of failing every single test
+        cls._adminConn = connectWithRetry(cls._engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._adminConn.close()
+        cls._engine.dispose()
+        for engine in cls._engines.values():
+            engine.dispose()
+
+    def setUp(self):
+        # one round-trip, no need to probe for existence first
+        cleanup = "; ".join("DROP DATABASE IF EXISTS `%s`" % dbName
+                            for dbName in (self._dbA, self._dbB, self._dbC))
+        try:
+            self._adminConn.execute(cleanup)
+        except sqlalchemy.exc.DBAPIError as e:
+            # server was restarted (e.g. testServerRestartReal), the
+            # invalidated connection reconnects when used again
+            if not e.connection_invalidated:
+                raise
+            self._adminConn.execute(cleanup)
+
+    def _makeEngine(self, **kwargs):
+        """
+        Return a new engine built from the credential file, kwargs override
+        values from the file (see getEngineFromFile).
+
+        Unless overridden, connection attempts give up after CONNECT_TIMEOUT
+        seconds, tests expecting a failure should not wait for the OS timeout.
+        """
+        kwargs.setdefault("connect_args", {"connect_timeout": self.CONNECT_TIMEOUT})
+        return getEngineFromFile(self._credFile, **kwargs)
+
+    @classmethod
+    def _pooledEngine(cls, **kwargs):
+        """
+        Return engine built from the credential file with values overridden by
+        kwargs, shared by all tests of the class asking for the same overrides,
+        so its pooled connections are reused. Only use it for connections that
+        are expected to work, failing tests should use _makeEngine.
+        """
+        key = tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+        if key not in cls._engines:
+            cls._engines[key] = getEngineFromFile(cls._credFile,
+                                                  pool_recycle=cls.POOL_RECYCLE, **kwargs)
+        return cls._engines[key]
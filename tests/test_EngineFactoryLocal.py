@@ -24,66 +24,64 @@
 This is a unittest for the EngineFactory functions, geared for testing
 local server connections.
 
-The test requires credential file ~/.lsst/dbAuth-testLocal.ini with the following:
+The test requires credential file ~/.lsst/dbAuth-testLocal.ini (location can be
+overridden with the LSST_DB_AUTH_LOCAL environment variable) with the following:
 
 [database]
 url = mysql+mysqldb://<userName>:<password>@localhost:13306/?unix_socket=<path to socket>
 
 User will need full mysql privileges.
 
+Logging defaults to WARNING, set LSST_DB_TEST_LOG_LEVEL (e.g. to DEBUG) to change it.
+
 
 @author  Jacek Becla, SLAC
 
 Known issues and todos:
- * restarting server test - it'd be best to restart it for real (without blocking
-   on user input.
+ * restarting server test - testServerRestart does not restart the server,
+   testServerRestartReal does it for real, running the command given in
+   LSST_DB_TEST_RESTART_CMD (e.g. "sudo service mysql restart").
 """
 
 # standard library
-from configparser import NoSectionError
-import logging as log
+from configparser import NoOptionError, NoSectionError
+import io
 import os
+import shlex
+import subprocess
 import tempfile
+import time
 import unittest
 
 # third party
 import sqlalchemy
 
 # local
-from lsst.db.engineFactory import getEngineFromFile, getEngineFromArgs
+from lsst.db.engineFactory import connectWithRetry, getEngineFromFile, getEngineFromArgs
 from lsst.db import utils
+import dbTestCase
 
 
-class TestDbLocal(unittest.TestCase):
-    CREDFILE = "~/.lsst/dbAuth-testLocal.ini"
-
-    @classmethod
-    def setUpClass(cls):
-        log.basicConfig(
-            format='%(asctime)s %(name)s %(levelname)s: %(message)s',
-            datefmt='%m/%d/%Y %I:%M:%S',
-            level=log.DEBUG)
+# tests waiting for DNS or TCP timeouts, run them only if LSST_DB_SLOW_TESTS is set
+slowTest = unittest.skipUnless(os.environ.get("LSST_DB_SLOW_TESTS"),
+                               "slow network-failure test, set LSST_DB_SLOW_TESTS to run")
 
-        credFile = os.path.expanduser(cls.CREDFILE)
-        if not os.path.isfile(credFile):
-            raise unittest.SkipTest("Required file with credentials"
-                                    " '{}' not found.".format(credFile))
 
-    def setUp(self):
-        self._engine = getEngineFromFile(self.CREDFILE)
-        self._dbA = "%s_dbWrapperTestDb_A" % self._engine.url.username
-        self._dbB = "%s_dbWrapperTestDb_B" % self._engine.url.username
-        self._dbC = "%s_dbWrapperTestDb_C" % self._engine.url.username
+class TestDbLocal(dbTestCase.DbTestCase):
+    CREDFILE = os.environ.get("LSST_DB_AUTH_LOCAL", "~/.lsst/dbAuth-testLocal.ini")
 
-        conn = self._engine.connect()
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # scratch file shared by tests that need one on disk, each test
+        # overwrites it; removed in tearDownClass even if a test fails
+        fd, cls._tmpFile = tempfile.mkstemp(prefix="lsstDbTest")
+        os.close(fd)
 
-        if utils.dbExists(conn, self._dbA):
-            utils.dropDb(conn, self._dbA)
-        if utils.dbExists(conn, self._dbB):
-            utils.dropDb(conn, self._dbB)
-        if utils.dbExists(conn, self._dbC):
-            utils.dropDb(conn, self._dbC)
-        conn.close()
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls._tmpFile)
+        super().tearDownClass()
 
     def testGetEngine(self):
         """
@@ -95,18 +93,13 @@ class TestDbLocal(unittest.TestCase):
         """
         Test overwriting values from config file.
         """
-        engine = getEngineFromFile(self.CREDFILE,
-                                   username="peter",
-                                   password="hi")
+        engine = self._makeEngine(username="peter", password="hi")
         self.assertEqual(engine.url.username, "peter")
         self.assertEqual(engine.url.password, "hi")
-        engine = getEngineFromFile(self.CREDFILE,
-                                   host="lsst125",
-                                   port="1233")
+        engine = self._makeEngine(host="lsst125", port="1233")
         self.assertEqual(engine.url.host, "lsst125")
         self.assertEqual(engine.url.port, "1233")
-        engine = getEngineFromFile(self.CREDFILE,
-                                   database="myBestDB")
+        engine = self._makeEngine(database="myBestDB")
         self.assertEqual(engine.url.database, "myBestDB")
 
     def testBasicSocketConn(self):
@@ -114,49 +107,48 @@ class TestDbLocal(unittest.TestCase):
         Basic test: connect through socket, create db and connect to it, create one
         table, drop the db, disconnect.
         """
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)")
-        utils.dropDb(conn, self._dbA)
-        conn.close()
+        with self._engine.connect() as conn:
+            utils.createDb(conn, self._dbA)
+            utils.useDb(conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int)")
+            utils.dropDb(conn, self._dbA)
 
     def testGetEngineFromArgs(self):
         url = self._engine.url
-        conn = getEngineFromArgs(drivername=url.drivername,
-                                 username=url.username,
-                                 password=url.password,
-                                 host=url.host,
-                                 port=url.port,
-                                 database=url.database,
-                                 query=url.query).connect()
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)")
-        utils.dropDb(conn, self._dbA)
-        conn.close()
+        engine = getEngineFromArgs(drivername=url.drivername,
+                                   username=url.username,
+                                   password=url.password,
+                                   host=url.host,
+                                   port=url.port,
+                                   database=url.database,
+                                   query=url.query)
+        with engine.connect() as conn:
+            utils.createAndUseDb(conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int)")
+            utils.dropDb(conn, self._dbA)
+        engine.dispose()
 
     def testUseDb(self):
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)")
-        self.assertRaises(utils.NoSuchDatabaseError,
-                          utils.useDb, conn, "invDbName")
-        utils.dropDb(conn, self._dbA)
-        self.assertRaises(utils.InvalidDatabaseNameError,
-                          utils.createTable, conn, "t1", "(i int)")
-        utils.createDb(conn, self._dbB)
-        utils.useDb(conn, self._dbB)
-        utils.createTable(conn, "t1", "(i int)")
-        utils.dropDb(conn, self._dbB)
-
-    def testConn_invalidHost1(self):
-        engine = getEngineFromFile(self.CREDFILE, host="invalidHost")
+        with self._engine.connect() as conn:
+            utils.createAndUseDb(conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int)")
+            self.assertRaises(utils.NoSuchDatabaseError,
+                              utils.useDb, conn, "invDbName")
+            utils.dropDb(conn, self._dbA)
+            self.assertRaises(utils.InvalidDatabaseNameError,
+                              utils.createTable, conn, "t1", "(i int)")
+            utils.createAndUseDb(conn, self._dbB)
+            utils.createTable(conn, "t1", "(i int)")
+            utils.dropDb(conn, self._dbB)
+
+    @slowTest
+    def testConn_invalidHostValidPort(self):
+        engine = self._makeEngine(host="invalidHost")
         self.assertRaises(sqlalchemy.exc.OperationalError, engine.connect)
 
-    def testConn_invalidHost2(self):
-        engine = getEngineFromFile(self.CREDFILE, host="dummyHost", port=3036)
+    @slowTest
+    def testConn_invalidHostInvalidPort(self):
+        engine = self._makeEngine(host="dummyHost", port=3036)
         self.assertRaises(sqlalchemy.exc.OperationalError, engine.connect)
 
     def testConn_invalidUserName(self):
@@ -167,298 +159,348 @@ class TestDbLocal(unittest.TestCase):
     def testConn_invalidSocket(self):
         # make sure retry is disabled, otherwise it wil try to reconnect
         # (it will assume the server is down and socket valid).
-        engine = getEngineFromFile(self.CREDFILE, host="localhost",
-                                   query={"unix_socket": "/x/sock"})
+        engine = self._makeEngine(host="localhost", query={"unix_socket": "/x/sock"})
         self.assertRaises(sqlalchemy.exc.OperationalError, engine.connect)
 
     def testConn_badSocketGoodHostPort(self):
         # invalid socket, but good host/port
-        conn = getEngineFromFile(self.CREDFILE, host='127.0.0.1', query={"unix_socket": "/x/sock"}).connect()
-        conn.close()
+        engine = self._makeEngine(host='127.0.0.1', query={"unix_socket": "/x/sock"})
+        with engine.connect():
+            pass
+        engine.dispose()
+
+    def testConnectWithRetry(self):
+        with connectWithRetry(self._engine, maxRetryCount=1, sleepLen=0) as conn:
+            self.assertTrue(utils.dbExists(conn, "information_schema"))
+        engine = self._makeEngine(host="localhost", query={"unix_socket": "/x/sock"})
+        self.assertRaises(sqlalchemy.exc.OperationalError, connectWithRetry,
+                          engine, maxRetryCount=2, sleepLen=0)
+        # access denied is not retried, it would sleep at least sleepLen otherwise
+        engine = self._makeEngine(username="dbWrapperNoSuchUser", password="wrongPassword")
+        start = time.time()
+        self.assertRaises(sqlalchemy.exc.OperationalError, connectWithRetry,
+                          engine, maxRetryCount=2, sleepLen=10)
+        self.assertLess(time.time() - start, 10)
 
     def testConn_invalidOptionFile(self):
         self.assertRaises(IOError, getEngineFromFile, "/tmp/dummy.opt.file.xyz")
 
     def testConn_badOptionFile(self):
+        fN = self._tmpFile
+
         # start with an empty file
-        fd, fN = tempfile.mkstemp(suffix=".cnf", text=True)
+        open(fN, 'w').close()
         self.assertRaises(NoSectionError, getEngineFromFile, fN)
 
         # add socket only
-        os.write(fd, '[client]\n')
-        os.write(fd, 'socket = /tmp/sth/wrong.sock\n')
-        os.close(fd)
+        with open(fN, 'w') as f:
+            f.write('[client]\nsocket = /tmp/sth/wrong.sock\n')
         self.assertRaises(NoSectionError, getEngineFromFile, fN)
 
-        os.remove(fN)
+        # database section without url
+        with open(fN, 'w') as f:
+            f.write('[database]\necho = yes\n')
+        self.assertRaises(NoOptionError, getEngineFromFile, fN)
+
+        # overrides must not stick, and edits must be picked up right away,
+        # even if the file size does not change
+        with open(fN, 'w') as f:
+            f.write('[database]\nurl = mysql+mysqldb://joe@127.0.0.1:13306/\n')
+        self.assertEqual(getEngineFromFile(fN).url.username, "joe")
+        self.assertEqual(getEngineFromFile(fN, username="peter").url.username, "peter")
+        self.assertEqual(getEngineFromFile(fN).url.username, "joe")
+        with open(fN, 'w') as f:
+            f.write('[database]\nurl = mysql+mysqldb://ann@127.0.0.1:13306/\n')
+        self.assertEqual(getEngineFromFile(fN).url.username, "ann")
 
     def testMultiDbs(self):
         """
         Try interleaving operations on multiple databases.
         """
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.createDb(conn, self._dbB)
-        utils.createDb(conn, self._dbC)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)", self._dbB)
-        utils.createTable(conn, "t1", "(i int)")
-        utils.createTable(conn, "t1", "(i int)", self._dbC)
-        utils.dropDb(conn, self._dbB)
-        utils.createTable(conn, "t2", "(i int)", self._dbA)
-        utils.dropDb(conn, self._dbA)
-        utils.useDb(conn, self._dbC)
-        utils.createTable(conn, "t2", "(i int)")
-        utils.createTable(conn, "t3", "(i int)", self._dbC)
-        utils.dropDb(conn, self._dbC)
-        conn.close()
+        with self._engine.connect() as conn:
+            utils.execScript(conn, ["CREATE DATABASE `%s`" % dbName
+                                    for dbName in (self._dbA, self._dbB, self._dbC)])
+            utils.useDb(conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int)", self._dbB)
+            utils.createTable(conn, "t1", "(i int)")
+            utils.createTable(conn, "t1", "(i int)", self._dbC)
+            utils.dropDb(conn, self._dbB)
+            utils.createTable(conn, "t2", "(i int)", self._dbA)
+            utils.dropDb(conn, self._dbA)
+            utils.useDb(conn, self._dbC)
+            utils.createTable(conn, "t2", "(i int)")
+            utils.createTable(conn, "t3", "(i int)", self._dbC)
+            utils.dropDb(conn, self._dbC)
 
     def testListTables(self):
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)", self._dbA)
-        utils.createTable(conn, "t2", "(i int)", self._dbA)
-        ret = utils.listTables(conn, self._dbA)
-        self.assertEqual(len(ret), 2)
-        self.assertIn("t1", ret)
-        self.assertIn("t2", ret)
-        ret = utils.listTables(conn, self._dbB)
-        self.assertEqual(len(ret), 0)
-
-        conn = getEngineFromFile(self.CREDFILE, database=self._dbA).connect()
-        ret = utils.listTables(conn)
-        self.assertEqual(len(ret), 2)
-        self.assertIn("t1", ret)
-        self.assertIn("t2", ret)
-        utils.dropDb(conn, self._dbA)
+        with self._engine.connect() as conn:
+            # fixture only, build it in one round-trip
+            utils.execScript(conn, ["CREATE DATABASE `%s`" % self._dbA,
+                                    "CREATE TABLE `%s`.t1 (i int)" % self._dbA,
+                                    "CREATE TABLE `%s`.t2 (i int)" % self._dbA])
+            ret = utils.listTables(conn, self._dbA)
+            self.assertEqual(len(ret), 2)
+            self.assertIn("t1", ret)
+            self.assertIn("t2", ret)
+            ret = utils.listTables(conn, self._dbB)
+            self.assertEqual(len(ret), 0)
+
+        engine = self._pooledEngine(database=self._dbA)
+        with engine.connect() as conn:
+            ret = utils.listTables(conn)
+            self.assertEqual(len(ret), 2)
+            self.assertIn("t1", ret)
+            self.assertIn("t2", ret)
+            utils.dropDb(conn, self._dbA)
+
+    def testExecScript(self):
+        with self._engine.connect() as conn:
+            utils.execScript(conn, ["CREATE DATABASE `%s`" % self._dbA,
+                                    "CREATE TABLE `%s`.t1 (i int)" % self._dbA,
+                                    "INSERT INTO `%s`.t1 VALUES (1), (2)" % self._dbA])
+            self.assertEqual(3, conn.execute("SELECT SUM(i) FROM `%s`.t1" % self._dbA).scalar())
+            # error in a statement other than the first one is still reported
+            self.assertRaises(sqlalchemy.exc.DBAPIError, utils.execScript, conn,
+                              ["SELECT 1", "DROP TABLE `%s`.dummy" % self._dbA])
+            utils.dropDb(conn, self._dbA)
+
+            # lost connection must be invalidated, not returned to the pool
+            connId = conn.execute("SELECT CONNECTION_ID()").scalar()
+            self._adminConn.execute("KILL %d" % connId)
+            with self.assertRaises(sqlalchemy.exc.DBAPIError) as cm:
+                utils.execScript(conn, ["SELECT 1"])
+            self.assertTrue(cm.exception.connection_invalidated)
+            self.assertTrue(conn.invalidated)
 
     def testResults(self):
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(id INT, theValue FLOAT)")
-        conn.execute("INSERT INTO t1 VALUES(1, 1.1), (2, 2.2)")
-        ret = conn.execute("SELECT * FROM t1")
-        self.assertEqual(len(ret.keys()), 2)
+        with self._engine.connect() as conn:
+            utils.execScript(conn, ["CREATE DATABASE `%s`" % self._dbA,
+                                    "USE `%s`" % self._dbA,
+                                    "CREATE TABLE t1 (id INT, theValue FLOAT)",
+                                    "INSERT INTO t1 VALUES(1, 1.1), (2, 2.2)"])
+            ret = conn.execute("SELECT * FROM t1")
+            self.assertEqual(len(ret.keys()), 2)
+            utils.dropDb(conn, self._dbA)
 
     def testMultiCreateDef(self):
         """
         Test creating db/table that already exists (in default db).
         """
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.createDb(conn, self._dbA, mayExist=True)
-        self.assertRaises(utils.DatabaseExistsError, utils.createDb, conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        self.assertRaises(utils.DatabaseExistsError, utils.createDb, conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)")
-        self.assertRaises(utils.TableExistsError, utils.createTable, conn, "t1", "(i int)")
-        utils.dropDb(conn, self._dbA)
+        with self._engine.connect() as conn:
+            utils.createDb(conn, self._dbA)
+            utils.createDb(conn, self._dbA, mayExist=True)
+            self.assertRaises(utils.DatabaseExistsError, utils.createDb, conn, self._dbA)
+            self.assertRaises(utils.DatabaseExistsError, utils.createAndUseDb, conn, self._dbA)
+            utils.createAndUseDb(conn, self._dbA, mayExist=True)
+            self.assertRaises(utils.DatabaseExistsError, utils.createDb, conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int)")
+            self.assertRaises(utils.TableExistsError, utils.createTable, conn, "t1", "(i int)")
+            utils.dropDb(conn, self._dbA)
 
     def testDropDb(self):
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.dropDb(conn, self._dbA)
-        utils.dropDb(conn, self._dbA, mustExist=False)
-        self.assertRaises(utils.NoSuchDatabaseError, utils.dropDb, conn, self._dbA)
-        conn.close()
+        with self._engine.connect() as conn:
+            utils.createDb(conn, self._dbA)
+            utils.dropDb(conn, self._dbA)
+            utils.dropDb(conn, self._dbA, mustExist=False)
+            self.assertRaises(utils.NoSuchDatabaseError, utils.dropDb, conn, self._dbA)
 
     def testMultiCreateNonDef(self):
         """
         Test creating db/table that already exists (in non default db).
         """
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        self.assertRaises(utils.DatabaseExistsError, utils.createDb, conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createDb(conn, self._dbB)
-        self.assertRaises(utils.DatabaseExistsError, utils.createDb, conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)")
-        self.assertRaises(utils.TableExistsError, utils.createTable, conn, "t1", "(i int)")
-        utils.createTable(conn, "t2", "(i int)", self._dbA)
-        self.assertRaises(utils.TableExistsError, utils.createTable, conn, "t1", "(i int)", self._dbA)
-        self.assertRaises(utils.TableExistsError, utils.createTable, conn, "t2", "(i int)", self._dbA)
-
-        utils.createTable(conn, "t1", "(i int)", self._dbB)
-        utils.createTable(conn, "t1", "(i int)", self._dbB, mayExist=True)
-        self.assertRaises(utils.TableExistsError, utils.createTable, conn, "t1", "(i int)", self._dbB)
-        utils.dropDb(conn, self._dbA)
-        conn.close()
+        with self._engine.connect() as conn:
+            utils.createDb(conn, self._dbA)
+            self.assertRaises(utils.DatabaseExistsError, utils.createDb, conn, self._dbA)
+            utils.useDb(conn, self._dbA)
+            utils.createDb(conn, self._dbB)
+            self.assertRaises(utils.DatabaseExistsError, utils.createDb, conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int)")
+            self.assertRaises(utils.TableExistsError, utils.createTable, conn, "t1", "(i int)")
+            utils.createTable(conn, "t2", "(i int)", self._dbA)
+            self.assertRaises(utils.TableExistsError, utils.createTable, conn, "t1", "(i int)", self._dbA)
+            self.assertRaises(utils.TableExistsError, utils.createTable, conn, "t2", "(i int)", self._dbA)
+
+            utils.createTable(conn, "t1", "(i int)", self._dbB)
+            utils.createTable(conn, "t1", "(i int)", self._dbB, mayExist=True)
+            self.assertRaises(utils.TableExistsError, utils.createTable, conn, "t1", "(i int)", self._dbB)
+            utils.dropDb(conn, self._dbA)
+            utils.dropDb(conn, self._dbB)
 
     def testCreateTableLike(self):
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)")
-        utils.createTableLike(conn, self._dbA, "t2", self._dbA, "t1")
-        self.assertTrue(utils.tableExists(conn, "t1", self._dbA))
-        self.assertRaises(sqlalchemy.exc.NoSuchTableError, utils.createTableLike,
-                          conn, self._dbA, "t2", self._dbA, "dummy")
+        with self._engine.connect() as conn:
+            utils.createAndUseDb(conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int)")
+            utils.createTableLike(conn, self._dbA, "t2", self._dbA, "t1")
+            self.assertTrue(utils.tableExists(conn, "t1", self._dbA))
+            self.assertRaises(sqlalchemy.exc.NoSuchTableError, utils.createTableLike,
+                              conn, self._dbA, "t2", self._dbA, "dummy")
+            utils.dropDb(conn, self._dbA)
 
     def testDropTable(self):
-        conn = self._engine.connect()
-        # using current db
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t2", "(i int)")
-        utils.dropTable(conn, "t2")
-        utils.dropTable(conn, "t2", mustExist=False)
-        self.assertRaises(sqlalchemy.exc.NoSuchTableError, utils.dropTable, conn, "t2")
-        utils.dropDb(conn, self._dbA)
-
-        # using no current db
-        utils.createDb(conn, self._dbB)
-        utils.createTable(conn, "t2", "(i int)", self._dbB)
-        utils.dropTable(conn, "t2", dbName=self._dbB)
-        utils.dropTable(conn, "t2", dbName=self._dbB, mustExist=False)
-        self.assertRaises(sqlalchemy.exc.NoSuchTableError,
-                          utils.dropTable, conn, "t2", self._dbB)
-        utils.dropDb(conn, self._dbB)
-
-        # mix of current and not current db
-        utils.createDb(conn, self._dbA)
-        utils.createDb(conn, self._dbB)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t2", "(i int)", self._dbB)
-        utils.createTable(conn, "t2", "(i int)")
-
-        utils.dropTable(conn, "t2")
-        utils.dropTable(conn, "t2", dbName=self._dbB)
-        utils.dropTable(conn, "t2", mustExist=False)
-        utils.dropTable(conn, "t2", dbName=self._dbB, mustExist=False)
-
-        self.assertRaises(sqlalchemy.exc.NoSuchTableError, utils.dropTable, conn, "t2")
-        self.assertRaises(sqlalchemy.exc.NoSuchTableError, utils.dropTable, conn, "t2", self._dbB)
-        utils.dropDb(conn, self._dbA)
-        utils.dropDb(conn, self._dbB)
-
-        conn.close()
+        with self._engine.connect() as conn:
+            # using current db
+            utils.createAndUseDb(conn, self._dbA)
+            utils.createTable(conn, "t2", "(i int)")
+            utils.dropTable(conn, "t2")
+            utils.dropTable(conn, "t2", mustExist=False)
+            self.assertRaises(sqlalchemy.exc.NoSuchTableError, utils.dropTable, conn, "t2")
+            utils.dropDb(conn, self._dbA)
+
+            # using no current db
+            utils.createDb(conn, self._dbB)
+            utils.createTable(conn, "t2", "(i int)", self._dbB)
+            utils.dropTable(conn, "t2", dbName=self._dbB)
+            utils.dropTable(conn, "t2", dbName=self._dbB, mustExist=False)
+            self.assertRaises(sqlalchemy.exc.NoSuchTableError,
+                              utils.dropTable, conn, "t2", self._dbB)
+            utils.dropDb(conn, self._dbB)
+
+            # mix of current and not current db
+            utils.createDb(conn, self._dbA)
+            utils.createDb(conn, self._dbB)
+            utils.useDb(conn, self._dbA)
+            utils.createTable(conn, "t2", "(i int)", self._dbB)
+            utils.createTable(conn, "t2", "(i int)")
+
+            utils.dropTable(conn, "t2")
+            utils.dropTable(conn, "t2", dbName=self._dbB)
+            utils.dropTable(conn, "t2", mustExist=False)
+            utils.dropTable(conn, "t2", dbName=self._dbB, mustExist=False)
+
+            self.assertRaises(sqlalchemy.exc.NoSuchTableError, utils.dropTable, conn, "t2")
+            self.assertRaises(sqlalchemy.exc.NoSuchTableError, utils.dropTable, conn, "t2", self._dbB)
+            utils.dropDb(conn, self._dbA)
+            utils.dropDb(conn, self._dbB)
 
     def testCheckExists(self):
         """
         Test checkExist for databases and tables.
         """
-        conn = self._engine.connect()
-        self.assertFalse(utils.dbExists(conn, "bla"))
-        self.assertFalse(utils.tableExists(conn, "bla"))
-        self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
-
-        utils.createDb(conn, self._dbA)
-        self.assertTrue(utils.dbExists(conn, self._dbA))
-        self.assertFalse(utils.dbExists(conn, "bla"))
-        self.assertFalse(utils.tableExists(conn, "bla"))
-        self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
-
-        utils.createTable(conn, "t1", "(i int)", self._dbA)
-        self.assertTrue(utils.dbExists(conn, self._dbA))
-        self.assertFalse(utils.dbExists(conn, "bla"))
-        self.assertTrue(utils.tableExists(conn, "t1", self._dbA))
-        # utils.useDb(conn, self._dbA)
-        conn = getEngineFromFile(self.CREDFILE, database=self._dbA).connect()
-        self.assertTrue(utils.tableExists(conn, "t1"))
-        self.assertFalse(utils.tableExists(conn, "bla"))
-        self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
-        utils.dropDb(conn, self._dbA)
+        with self._engine.connect() as conn:
+            self.assertFalse(utils.dbExists(conn, "bla"))
+            self.assertFalse(utils.tableExists(conn, "bla"))
+            self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
+
+            utils.createDb(conn, self._dbA)
+            self.assertTrue(utils.dbExists(conn, self._dbA))
+            self.assertFalse(utils.dbExists(conn, "bla"))
+            self.assertFalse(utils.tableExists(conn, "bla"))
+            self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
+
+            utils.createTable(conn, "t1", "(i int)", self._dbA)
+            self.assertTrue(utils.dbExists(conn, self._dbA))
+            self.assertFalse(utils.dbExists(conn, "bla"))
+            self.assertTrue(utils.tableExists(conn, "t1", self._dbA))
 
-        self.assertFalse(utils.userExists(conn, "d_Xx_u12my", "localhost"))
-        self.assertTrue(utils.userExists(conn, "root", "localhost"))
+        # utils.useDb(conn, self._dbA)
+        engine = self._pooledEngine(database=self._dbA)
+        with engine.connect() as conn:
+            self.assertTrue(utils.tableExists(conn, "t1"))
+            self.assertFalse(utils.tableExists(conn, "bla"))
+            self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
+            utils.dropDb(conn, self._dbA)
 
-        conn.close()
+            self.assertFalse(utils.userExists(conn, "d_Xx_u12my", "localhost"))
+            self.assertTrue(utils.userExists(conn, "root", "localhost"))
 
     def testOptParams(self):
         """
         Testing optional parameter binding.
         """
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i char(64), j char(64))")
-        conn.execute("INSERT INTO t1 VALUES(%s, %s)", ("aaa", "bbb"))
-        utils.dropDb(conn, self._dbA)
+        with self._engine.connect() as conn:
+            utils.createAndUseDb(conn, self._dbA)
+            utils.createTable(conn, "t1", "(i char(64), j char(64))")
+            conn.execute("INSERT INTO t1 VALUES(%s, %s)", ("aaa", "bbb"))
+            utils.dropDb(conn, self._dbA)
 
     def testViews(self):
         """
         Testing functionality related to views.
         """
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int, j int)")
-        conn.execute("CREATE VIEW t2 AS SELECT i FROM t1")
-        self.assertFalse(utils.isView(conn, "t1"))
-        self.assertFalse(utils.isView(conn, "dummyT"))
-        self.assertTrue(utils.isView(conn, "t2"))
-        utils.dropDb(conn, self._dbA)
+        with self._engine.connect() as conn:
+            utils.createAndUseDb(conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int, j int)")
+            conn.execute("CREATE VIEW t2 AS SELECT i FROM t1")
+            self.assertFalse(utils.isView(conn, "t1"))
+            self.assertFalse(utils.isView(conn, "dummyT"))
+            self.assertTrue(utils.isView(conn, "t2"))
+            utils.dropDb(conn, self._dbA)
 
     def testServerRestart(self):
         """
         Testing recovery from lost connection.
         """
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        # time.sleep(10)
-        # ##########################################################################
-        # FIXME!!! now getting (OperationalError) (2006, 'MySQL server has gone away
-        # ##########################################################################
-        utils.createDb(conn, self._dbB)
-        utils.dropDb(conn, self._dbA)
-        utils.dropDb(conn, self._dbB)
+        with self._engine.connect() as conn:
+            utils.createDb(conn, self._dbA)
+            # time.sleep(10)
+            # ##########################################################################
+            # FIXME!!! now getting (OperationalError) (2006, 'MySQL server has gone away
+            # ##########################################################################
+            utils.createDb(conn, self._dbB)
+            utils.dropDb(conn, self._dbA)
+            utils.dropDb(conn, self._dbB)
+
+    @unittest.skipUnless(os.environ.get("LSST_DB_TEST_RESTART_CMD"),
+                         "restarts the server, set LSST_DB_TEST_RESTART_CMD to run")
+    def testServerRestartReal(self):
+        """
+        Testing recovery after the server was restarted.
+        """
+        with self._engine.connect() as conn:
+            utils.createDb(conn, self._dbA)
+        subprocess.check_call(shlex.split(os.environ["LSST_DB_TEST_RESTART_CMD"]))
+        # pooled connections are stale now, server may still be starting up
+        self._engine.dispose()
+        with connectWithRetry(self._engine) as conn:
+            self.assertTrue(utils.dbExists(conn, self._dbA))
+            utils.createDb(conn, self._dbB)
+            utils.dropDb(conn, self._dbA)
+            utils.dropDb(conn, self._dbB)
 
     def testLoadSqlScriptNoDb(self):
-        fd, fN = tempfile.mkstemp(suffix=".csv", text=True)
-        os.write(fd, "create database %s;\n" % self._dbA)
-        os.write(fd, "use %s;\n" % self._dbA)
-        os.write(fd, "create table t(i int);\n")
-        os.write(fd, "insert into t values (1), (2), (2), (5);\n")
-        os.close(fd)
-        conn = self._engine.connect()
-        utils.loadSqlScript(conn, fN)
-        self.assertEqual(10, conn.execute("select sum(i) from %s.t" % self._dbA).first()[0])
-        utils.dropDb(conn, self._dbA)
-        conn.close()
-        os.remove(fN)
+        # in-memory script, no need for a temporary file
+        script = io.StringIO("create database %s;\n"
+                             "use %s;\n"
+                             "create table t(i int);\n"
+                             "insert into t values (1), (2), (2), (5);\n" % (self._dbA, self._dbA))
+        with self._engine.connect() as conn:
+            utils.loadSqlScript(conn, script)
+            self.assertEqual(10, conn.execute("select sum(i) from %s.t" % self._dbA).first()[0])
+            utils.dropDb(conn, self._dbA)
 
     def testLoadSqlScriptWithDb(self):
-        fd, fN = tempfile.mkstemp(suffix=".csv", text=True)
-        os.write(fd, "create table t(i int, d double);\n")
-        os.write(fd, "insert into t values (1, 1.1), (2, 2.2);\n")
-        os.close(fd)
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.loadSqlScript(conn, fN, self._dbA)
-        self.assertEqual(3, conn.execute("select sum(i) from %s.t" % self._dbA).first()[0])
-        utils.dropDb(conn, self._dbA)
-        conn.close()
-        os.remove(fN)
+        script = io.StringIO("create table t(i int, d double);\n"
+                             "insert into t values (1, 1.1), (2, 2.2);\n")
+        with self._engine.connect() as conn:
+            utils.createDb(conn, self._dbA)
+            utils.loadSqlScript(conn, script, self._dbA)
+            self.assertEqual(3, conn.execute("select sum(i) from %s.t" % self._dbA).first()[0])
+            utils.dropDb(conn, self._dbA)
 
     def testLoadDataInFile(self):
         """
         Testing "LOAD DATA INFILE..."
         """
-        fd, fN = tempfile.mkstemp(suffix=".csv", text=True)
-        os.write(fd, '1\n2\n3\n4\n4\n4\n5\n3\n')
-        os.close(fd)
+        fN = self._tmpFile
+        with open(fN, 'w') as f:
+            f.write('1\n2\n3\n4\n4\n4\n5\n3\n')
 
         query = self._engine.url.query.copy()
         query['local_infile'] = '1'
-        conn = getEngineFromFile(self.CREDFILE, query=query).connect()
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)")
-        conn.execute("LOAD DATA LOCAL INFILE '%s' INTO TABLE t1" % fN)
-        x = conn.execute("SELECT COUNT(*) FROM t1")
-        self.assertEqual(8, conn.execute("SELECT COUNT(*) FROM t1").first()[0])
-        self.assertEqual(3, conn.execute("SELECT COUNT(*) FROM t1 WHERE i=4").first()[0])
-
-        # let's add some confusing data to the loaded file, it will get truncated
-        f = open(fN, 'w')
-        f.write('11,12,13,14\n2')
-        f.close()
-        conn.execute("LOAD DATA LOCAL INFILE '%s' INTO TABLE t1" % fN)
-
-        utils.dropDb(conn, self._dbA)
-        conn.close()
-        os.remove(fN)
+        engine = self._pooledEngine(query=query)
+        with engine.connect() as conn:
+            utils.createAndUseDb(conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int)")
+            conn.execute("LOAD DATA LOCAL INFILE '%s' INTO TABLE t1" % fN)
+            self.assertEqual(8, conn.execute("SELECT COUNT(*) FROM t1").first()[0])
+            self.assertEqual(3, conn.execute("SELECT COUNT(*) FROM t1 WHERE i=4").first()[0])
+
+            # let's add some confusing data to the loaded file, it will get truncated
+            with open(fN, 'w') as f:
+                f.write('11,12,13,14\n2')
+            conn.execute("LOAD DATA LOCAL INFILE '%s' INTO TABLE t1" % fN)
+
+            utils.dropDb(conn, self._dbA)
 
 
 if __name__ == "__main__":
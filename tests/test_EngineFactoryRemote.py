@@ -24,20 +24,22 @@
 This is a unittest for the EngineFactory functions, geared for testing
 remote server connections.
 
-The test requires credential file ~/.lsst/dbAuth-testRemote.ini with the following:
+The test requires credential file ~/.lsst/dbAuth-testRemote.ini (location can be
+overridden with the LSST_DB_AUTH_REMOTE environment variable) with the following:
 
 [database]
 url = mysql+mysqldb://<userName>:<password>@127.0.0.1:13306/
 
 It is sufficient if the user has normal privileges.
 
+Logging defaults to WARNING, set LSST_DB_TEST_LOG_LEVEL (e.g. to DEBUG) to change it.
+
 
 @author  Jacek Becla, SLAC
 
 """
 
 # standard library
-import logging as log
 import os
 import unittest
 
@@ -45,77 +47,59 @@ import unittest
 import sqlalchemy
 
 # local
-from lsst.db.engineFactory import getEngineFromFile, getEngineFromArgs
+from lsst.db.engineFactory import getEngineFromArgs
 from lsst.db import utils
+import dbTestCase
 
 
-class TestDbRemote(unittest.TestCase):
-    CREDFILE = "~/.lsst/dbAuth-testRemote.ini"
-
-    @classmethod
-    def setUpClass(cls):
-        log.basicConfig(
-            format='%(asctime)s %(name)s %(levelname)s: %(message)s',
-            datefmt='%m/%d/%Y %I:%M:%S',
-            level=log.DEBUG)
+# tests waiting for DNS or TCP timeouts, run them only if LSST_DB_SLOW_TESTS is set
+slowTest = unittest.skipUnless(os.environ.get("LSST_DB_SLOW_TESTS"),
+                               "slow network-failure test, set LSST_DB_SLOW_TESTS to run")
 
-        credFile = os.path.expanduser(cls.CREDFILE)
-        if not os.path.isfile(credFile):
-            raise unittest.SkipTest("Required file with credentials"
-                                    " '{}' not found.".format(credFile))
 
-    def setUp(self):
-        self._engine = getEngineFromFile(self.CREDFILE)
-        self._dbA = "%s_dbWrapperTestDb_A" % self._engine.url.username
-        self._dbB = "%s_dbWrapperTestDb_B" % self._engine.url.username
-        self._dbC = "%s_dbWrapperTestDb_C" % self._engine.url.username
-
-        conn = self._engine.connect()
-        if utils.dbExists(conn, self._dbA):
-            utils.dropDb(conn, self._dbA)
-        if utils.dbExists(conn, self._dbB):
-            utils.dropDb(conn, self._dbB)
-        if utils.dbExists(conn, self._dbC):
-            utils.dropDb(conn, self._dbC)
-        conn.close()
+class TestDbRemote(dbTestCase.DbTestCase):
+    CREDFILE = os.environ.get("LSST_DB_AUTH_REMOTE", "~/.lsst/dbAuth-testRemote.ini")
 
     def testBasicOptionFileConn(self):
-        conn = self._engine.connect()
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)")
-        utils.dropDb(conn, self._dbA)
-        conn.close()
+        with self._engine.connect() as conn:
+            utils.createDb(conn, self._dbA)
+            utils.useDb(conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int)")
+            utils.dropDb(conn, self._dbA)
 
     def testGetEngineFromArgs(self):
         url = self._engine.url
-        conn = getEngineFromArgs(drivername=url.drivername,
-                                 username=url.username,
-                                 password=url.password,
-                                 host=url.host,
-                                 port=url.port,
-                                 database=url.database,
-                                 query=url.query).connect()
-        utils.createDb(conn, self._dbA)
-        utils.useDb(conn, self._dbA)
-        utils.createTable(conn, "t1", "(i int)")
-        utils.dropDb(conn, self._dbA)
-        conn.close()
-
-    def testConn_invalidHost1(self):
-        engine = getEngineFromFile(self.CREDFILE, host="invalidHost")
+        engine = getEngineFromArgs(drivername=url.drivername,
+                                   username=url.username,
+                                   password=url.password,
+                                   host=url.host,
+                                   port=url.port,
+                                   database=url.database,
+                                   query=url.query)
+        with engine.connect() as conn:
+            utils.createAndUseDb(conn, self._dbA)
+            utils.createTable(conn, "t1", "(i int)")
+            utils.dropDb(conn, self._dbA)
+        engine.dispose()
+
+    @slowTest
+    def testConn_invalidHostValidPort(self):
+        engine = self._makeEngine(host="invalidHost")
         self.assertRaises(sqlalchemy.exc.OperationalError, engine.connect)
 
-    def testConn_invalidHost2(self):
-        engine = getEngineFromFile(self.CREDFILE, host="dummyHost", port=3036)
+    @slowTest
+    def testConn_invalidHostInvalidPort(self):
+        engine = self._makeEngine(host="dummyHost", port=3036)
         self.assertRaises(sqlalchemy.exc.OperationalError, engine.connect)
 
+    @slowTest
     def testConn_invalidPortNo(self):
-        engine = getEngineFromFile(self.CREDFILE, port=987654)
+        engine = self._makeEngine(port=987654)
         self.assertRaises(sqlalchemy.exc.OperationalError, engine.connect)
 
+    @slowTest
     def testConn_wrongPortNo(self):
-        engine = getEngineFromFile(self.CREDFILE, port=1579)
+        engine = self._makeEngine(port=1579)
         self.assertRaises(sqlalchemy.exc.OperationalError, engine.connect)
 
     def testConn_invalidUserName(self):
@@ -127,29 +111,29 @@ class TestDbRemote(unittest.TestCase):
         """
         Test checkExist for databases and tables.
         """
-        conn = self._engine.connect()
-        self.assertFalse(utils.dbExists(conn, "bla"))
-        self.assertFalse(utils.tableExists(conn, "bla"))
-        self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
-
-        utils.createDb(conn, self._dbA)
-        self.assertTrue(utils.dbExists(conn, self._dbA))
-        self.assertFalse(utils.dbExists(conn, "bla"))
-        self.assertFalse(utils.tableExists(conn, "bla"))
-        self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
-
-        utils.createTable(conn, "t1", "(i int)", self._dbA)
-        self.assertTrue(utils.dbExists(conn, self._dbA))
-        self.assertFalse(utils.dbExists(conn, "bla"))
-        self.assertTrue(utils.tableExists(conn, "t1", self._dbA))
-        # utils.useDb(conn, self._dbA)
-        conn = getEngineFromFile(self.CREDFILE, database=self._dbA).connect()
-        self.assertTrue(utils.tableExists(conn, "t1"))
-        self.assertFalse(utils.tableExists(conn, "bla"))
-        self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
-        utils.dropDb(conn, self._dbA)
+        with self._engine.connect() as conn:
+            self.assertFalse(utils.dbExists(conn, "bla"))
+            self.assertFalse(utils.tableExists(conn, "bla"))
+            self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
+
+            utils.createDb(conn, self._dbA)
+            self.assertTrue(utils.dbExists(conn, self._dbA))
+            self.assertFalse(utils.dbExists(conn, "bla"))
+            self.assertFalse(utils.tableExists(conn, "bla"))
+            self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
+
+            utils.createTable(conn, "t1", "(i int)", self._dbA)
+            self.assertTrue(utils.dbExists(conn, self._dbA))
+            self.assertFalse(utils.dbExists(conn, "bla"))
+            self.assertTrue(utils.tableExists(conn, "t1", self._dbA))
 
-        conn.close()
+        # utils.useDb(conn, self._dbA)
+        engine = self._pooledEngine(database=self._dbA)
+        with engine.connect() as conn:
+            self.assertTrue(utils.tableExists(conn, "t1"))
+            self.assertFalse(utils.tableExists(conn, "bla"))
+            self.assertFalse(utils.tableExists(conn, "bla", "blaBla"))
+            utils.dropDb(conn, self._dbA)
 
 
 if __name__ == "__main__":
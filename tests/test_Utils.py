@@ -23,7 +23,8 @@
 """
 This is a unittest for the db.utils mdule.
 
-The test requires credential file ~/.lsst/dbAuth-testUtils.ini with the following:
+The test requires credential file ~/.lsst/dbAuth-testUtils.ini (location can be
+overridden with the LSST_DB_AUTH_UTILS environment variable) with the following:
 
 [database]
 url = mysql+mysqldb://<userName>:<password>@localhost:13306/?unix_socket=<path to socket>
@@ -32,56 +33,47 @@ url = mysql+mysqldb://<userName>:<password>@localhost:13306/?unix_socket=<path t
 
 """
 
+import io
 import os
 import tempfile
 import unittest
 
-import lsst.log as log
-from lsst.db.engineFactory import getEngineFromFile
 from lsst.db import utils
+import dbTestCase
 
 
-class TestUtils(unittest.TestCase):
-    CREDFILE = "~/.lsst/dbAuth-testUtils.ini"
-
-    @classmethod
-    def setUpClass(cls):
-        credFile = os.path.expanduser(cls.CREDFILE)
-        if not os.path.isfile(credFile):
-            raise unittest.SkipTest("Required file with credentials"
-                                    " '{}' not found.".format(credFile))
+class TestUtils(dbTestCase.DbTestCase):
+    CREDFILE = os.environ.get("LSST_DB_AUTH_UTILS", "~/.lsst/dbAuth-testUtils.ini")
 
     def testLoadSqlScriptFromObject(self):
-        conn = getEngineFromFile(self.CREDFILE).connect()
-        dbName = "%s_dbWrapperTestDb" % conn.engine.url.username
+        dbName = self._dbA
 
         commands = ["create database %s;" % dbName,
                     "use %s;" % dbName,
                     "create table t(i int);",
                     "insert into t values (1), (2), (2), (5);"]
 
-        # make file object and pass it to loadSqlScript
-        script = tempfile.TemporaryFile()
-        script.write('\n'.join(commands))
-        script.seek(0)
-        utils.loadSqlScript(conn, script)
-        utils.dropDb(conn, dbName)
+        with self._engine.connect() as conn:
+            # make in-memory file object and pass it to loadSqlScript
+            script = io.BytesIO('\n'.join(commands).encode())
+            utils.loadSqlScript(conn, script)
+            utils.dropDb(conn, dbName)
 
     def testLoadSqlScriptFromPath(self):
-        conn = getEngineFromFile(self.CREDFILE).connect()
-        dbName = "%s_dbWrapperTestDb" % conn.engine.url.username
+        dbName = self._dbA
 
         commands = ["create database %s;" % dbName,
                     "use %s;" % dbName,
                     "create table t(i int);",
                     "insert into t values (1), (2), (2), (5);"]
 
-        # make file but pass the name of that file to loadSqlScript
-        script = tempfile.NamedTemporaryFile()
-        script.write('\n'.join(commands))
-        script.seek(0)
-        utils.loadSqlScript(conn, script.name)
-        utils.dropDb(conn, dbName)
+        with self._engine.connect() as conn:
+            # make file but pass the name of that file to loadSqlScript
+            with tempfile.NamedTemporaryFile('w', suffix=".sql") as script:
+                script.write('\n'.join(commands))
+                script.flush()
+                utils.loadSqlScript(conn, script.name)
+            utils.dropDb(conn, dbName)
 
 
 if __name__ == "__main__":